@@ -11,9 +11,16 @@ CURRENT_HISTORY_MODE = (
 )
 
 # Model configurations
-DEFAULT_MODEL_FAST = "qwen3:4b"
-DEFAULT_MODEL_SMART = "qwen3:4b"
-DEFAULT_MODEL_VISION = "gemma3:4b"
+# Tags pin 4-bit (Q4_K_M) weights: single-stream decoding is bound by weight
+# bandwidth, so smaller weights translate directly into faster generation.
+DEFAULT_MODEL_FAST = "qwen3:4b-q4_K_M"
+DEFAULT_MODEL_SMART = "qwen3:4b-q4_K_M"
+DEFAULT_MODEL_VISION = "gemma3:4b-it-q4_K_M"
+# Input validation is a one-word valid/unrelated label, a sub-1B model is enough
+DEFAULT_MODEL_CLASSIFIER = "qwen3:0.6b-q4_K_M"
+
+# How long Ollama keeps a model (and its prompt KV cache) loaded between calls
+OLLAMA_KEEP_ALIVE = "10m"
 
 # Temperature settings
 TEMPERATURE_MAIN = 0
@@ -22,5 +29,22 @@ TEMPERATURE_SESSION = 0.1
 TEMPERATURE_SUMMARY = 0.1
 TEMPERATURE_DECISION = 0
 
+# Generation caps (num_predict). Validation answers with a single word, the
+# JSON nodes with a small object, so nothing useful is produced past these.
+NUM_PREDICT_VALIDATION = 32
+NUM_PREDICT_JSON = 512
+
+# Context window (num_ctx) per model. Ollama reloads a model whenever num_ctx
+# changes, so every client of the same model must use the same value. The
+# classifier only ever sees one short validation prompt.
+NUM_CTX = 4096
+NUM_CTX_CLASSIFIER = 1024
+
+# Number of normalized inputs whose validation verdict is remembered
+VALIDATION_CACHE_SIZE = 1024
+
+# Number of exact (model, prompt) LLM responses kept in the in-process cache
+LLM_CACHE_SIZE = 256
+
 # Recursion limit for graph execution
 DEFAULT_RECURSION_LIMIT = 100
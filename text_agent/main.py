@@ -4,20 +4,37 @@ Security Gate System - Main Entry Point
 This is the main entry point for the security gate system.
 """
 
+import logging
+import os
 import sys
+import threading
 import uvicorn
 import socketio
 from sockets import image_queue, socketio_events_queue, state_request_queue, sio
 from src.processing.image_processor import image_processing_function
+from models.llm_config import warmup_llms
 import multiprocessing
 
+# uvloop is not installed on Windows (see requirements.txt); fall back to uvicorn's default there
+try:
+    import uvloop  # noqa: F401
+
+    UVICORN_LOOP = "uvloop"
+except ImportError:
+    UVICORN_LOOP = "auto"
+
 def main():
     """Main entry point for the security gate system."""
+    # Debug output from the graph nodes is only emitted with LOG_LEVEL=DEBUG
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
     try:
         # Start image processing in a separate process
         processing_process = multiprocessing.Process(target=image_processing_function, args=(image_queue, socketio_events_queue, state_request_queue))
         processing_process.start()
 
+        # Load the text and vision models in the background so startup is not blocked
+        threading.Thread(target=warmup_llms, daemon=True).start()
 
 
         # --- Socket.IO Integration ---
@@ -29,8 +46,9 @@ def main():
 
         # --- Server Startup ---
         print("🌐 Starting Security Gate System (API + Socket.IO) on http://localhost:8001 ...")
-        # Run the combined ASGI application using Uvicorn
-        uvicorn.run(asgi_app, host="0.0.0.0", port=8001)
+        # Run the combined ASGI application using Uvicorn; the default "auto"
+        # http setting picks httptools when installed
+        uvicorn.run(asgi_app, host="0.0.0.0", port=8001, loop=UVICORN_LOOP)
 
         # --- Cleanup ---
         print("🛑 Shutting down image processing...")
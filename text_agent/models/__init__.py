@@ -6,6 +6,7 @@ from models.llm_config import (
     llm_decision_json,
     llm_summary,
     llm_email,
+    warmup_llms,
 )
 
 __all__ = [
@@ -15,4 +16,5 @@ __all__ = [
     "llm_decision_json",
     "llm_summary",
     "llm_email",
+    "warmup_llms",
 ]
@@ -1,59 +1,137 @@
 import os
+from ollama import Client
+from langchain_core.globals import set_llm_cache
 from langchain_ollama import ChatOllama
 from src.tools.communication import tools
+from src.utils.cache import LRULLMCache
 from config.settings import (
     DEFAULT_MODEL_FAST,
     DEFAULT_MODEL_SMART,
     DEFAULT_MODEL_VISION,
+    DEFAULT_MODEL_CLASSIFIER,
     TEMPERATURE_MAIN,
     TEMPERATURE_VALIDATION,
     TEMPERATURE_SESSION,
     TEMPERATURE_SUMMARY,
     TEMPERATURE_DECISION,
+    OLLAMA_KEEP_ALIVE,
+    NUM_PREDICT_VALIDATION,
+    NUM_PREDICT_JSON,
+    NUM_CTX,
+    NUM_CTX_CLASSIFIER,
+    LLM_CACHE_SIZE,
 )
 
 # Get Ollama host from environment variable (set by docker-compose)
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://192.168.0.86:11434")
 
 
-# Initialize all LLMs with containerized Ollama host
+# Identical prompts to the same model configuration are answered from memory.
+# Only the temperature 0 clients use it; the sampling ones pass cache=False so
+# one sampled answer is not replayed for every identical prompt.
+set_llm_cache(LRULLMCache(maxsize=LLM_CACHE_SIZE))
+
+# Initialize all LLMs with containerized Ollama host. keep_alive keeps the
+# weights resident so consecutive calls can reuse Ollama's cached prompt prefix.
 llm_summary = ChatOllama(
-    model=DEFAULT_MODEL_FAST, temperature=TEMPERATURE_SUMMARY, base_url=OLLAMA_HOST
+    model=DEFAULT_MODEL_FAST,
+    cache=False,
+    temperature=TEMPERATURE_SUMMARY,
+    num_ctx=NUM_CTX,
+    base_url=OLLAMA_HOST,
+    keep_alive=OLLAMA_KEEP_ALIVE,
 )
 llm_email = ChatOllama(
-    model=DEFAULT_MODEL_SMART, temperature=TEMPERATURE_DECISION, base_url=OLLAMA_HOST
-).bind_tools(tools)
+    model=DEFAULT_MODEL_SMART,
+    temperature=TEMPERATURE_DECISION,
+    num_ctx=NUM_CTX,
+    base_url=OLLAMA_HOST,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    cache=False,  # every notification must really trigger the send_email tool call
+).bind_tools(tools).bind(think=False)
 
-# JSON-enabled LLMs for structured output
+# JSON-enabled LLMs for structured output. The temperature 0 ones decode
+# greedily (top_k=1) and all of them stop at their num_predict cap. The qwen3
+# ones (and llm_email above) are bound with think=False so the model answers
+# directly instead of generating a discarded <think> block.
 llm_profiler_json = ChatOllama(
     model=DEFAULT_MODEL_SMART,
     temperature=TEMPERATURE_MAIN,
+    top_k=1,
+    num_predict=NUM_PREDICT_JSON,
     format="json",
+    num_ctx=NUM_CTX,
     base_url=OLLAMA_HOST,
-)
+    keep_alive=OLLAMA_KEEP_ALIVE,
+).bind(think=False)
 llm_validation_json = ChatOllama(
-    model=DEFAULT_MODEL_FAST,
+    model=DEFAULT_MODEL_CLASSIFIER,
+    cache=False,
     temperature=TEMPERATURE_VALIDATION,
+    num_predict=NUM_PREDICT_VALIDATION,
+    num_ctx=NUM_CTX_CLASSIFIER,
     format="json",
     base_url=OLLAMA_HOST,
-)
+    keep_alive=OLLAMA_KEEP_ALIVE,
+).bind(think=False)
 llm_session_json = ChatOllama(
     model=DEFAULT_MODEL_SMART,
+    cache=False,
     temperature=TEMPERATURE_SESSION,
+    num_predict=NUM_PREDICT_JSON,
     format="json",
+    num_ctx=NUM_CTX,
     base_url=OLLAMA_HOST,
-)
+    keep_alive=OLLAMA_KEEP_ALIVE,
+).bind(think=False)
 llm_decision_json = ChatOllama(
     model=DEFAULT_MODEL_SMART,
     temperature=TEMPERATURE_DECISION,
+    top_k=1,
+    num_predict=NUM_PREDICT_JSON,
     format="json",
+    num_ctx=NUM_CTX,
     base_url=OLLAMA_HOST,
-)
+    keep_alive=OLLAMA_KEEP_ALIVE,
+).bind(think=False)
 
-# Vision-enabled LLM initialization
+# Vision-enabled LLM initialization. Not cached: every prompt embeds a
+# distinct base64 frame, which would only fill the cache with images.
 llm_vision_json = ChatOllama(
+    cache=False,
     model=DEFAULT_MODEL_VISION,
     temperature=TEMPERATURE_MAIN,
+    top_k=1,
+    num_predict=NUM_PREDICT_JSON,
     format="json",
     base_url=OLLAMA_HOST,
+    keep_alive=OLLAMA_KEEP_ALIVE,
 )
+
+
+def warmup_llms():
+    """
+    Load the text and vision models into Ollama ahead of the first visitor.
+
+    An empty generate request makes Ollama load the weights without producing
+    any tokens, so the first graph run and the first camera frame do not pay
+    the cold-start load. The num_ctx must match the clients above, otherwise
+    Ollama reloads on first use (None keeps the model's default).
+    """
+    client = Client(host=OLLAMA_HOST)
+    context_sizes = {
+        DEFAULT_MODEL_FAST: NUM_CTX,
+        DEFAULT_MODEL_SMART: NUM_CTX,
+        DEFAULT_MODEL_CLASSIFIER: NUM_CTX_CLASSIFIER,
+        DEFAULT_MODEL_VISION: None,
+    }
+    for model, num_ctx in context_sizes.items():
+        try:
+            client.generate(
+                model=model,
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                options={"num_ctx": num_ctx} if num_ctx else None,
+            )
+            print(f"🔥 Model {model} loaded")
+        except Exception as e:
+            print(f"⚠️ Could not preload model {model}: {e}")
@@ -1,19 +1,22 @@
 """
 Socket.IO communication channels for the security gate system.
 """
+import logging
 import socketio
 import uuid
 import base64
 import json
+import orjson
 import os
 import time
-from typing import Any, Dict, Optional
-from pydantic import BaseModel
+from typing import Any, Dict
 import multiprocessing
 import asyncio
 import aiofiles
 from config.settings import DEFAULT_RECURSION_LIMIT
-from src.core.graph import create_initial_state, create_security_graph
+from src.core.graph import create_initial_state, get_security_graph
+
+logger = logging.getLogger(__name__)
 
 # Utility
 
@@ -53,37 +56,41 @@ def _generate_graph_visualization():
 
 
 # Initialize objects vars
-shared_graph = create_security_graph()
+shared_graph = get_security_graph()
 session_states: Dict[str, Any] = {}  # keyed by sid
 active_connections: Dict[str, bool] = {}  # Track active sids
 cameraSidMap: Dict[str, str] = {} # TODO: Use this mapping like ("sid-placeholder", "CAM-1").
-sessions_lock = asyncio.Lock()
+# One lock per sid, held for a whole turn so runs and state updates for the
+# same session never interleave while other sessions proceed independently.
+# Plain dict reads and writes need no lock: they never span an await.
+session_locks: Dict[str, asyncio.Lock] = {}
+graph_tasks: set = set()  # Strong refs to in-flight triggered graph runs
+state_update_tasks: set = set()  # Strong refs to pending state updates
+_threat_log_cache: tuple = (None, None)  # ((mtime_ns, size), parsed vision log)
 image_queue = multiprocessing.Queue(maxsize=10)
-face_detection_queue = multiprocessing.Queue(maxsize=4)
+_IMAGE_CHECK_CHARS = 4096  # Leading base64 characters of an upload that are validated
 socketio_events_queue = multiprocessing.Queue(maxsize=20)
 state_request_queue = multiprocessing.Queue(maxsize=50)
-state_response_queue = multiprocessing.Queue(maxsize=50)
 
 # Graph visualized and saved as image
 # _generate_graph_visualization()
 
-# --- Pydantic models for request/response validation ---
-class UserInput(BaseModel):
-    message: str
-
-class ImageUploadRequest(BaseModel):
-    image: str
-    timestamp: str
-
-class ImageUploadResponse(BaseModel):
-    status: str
-    message: str
-    image_id: Optional[str] = None
-
 # --- Socket.IO Server Instance ---
 sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
 
 # --- Helper Functions ---
+def _session_lock(sid: str) -> asyncio.Lock:
+    """Get the lock serializing work on a session, creating it on first use."""
+    return session_locks.setdefault(sid, asyncio.Lock())
+
+def _is_base64(image_b64: str) -> bool:
+    """Check that an upload is base64 by decoding a bounded prefix, not the whole frame."""
+    try:
+        base64.b64decode(image_b64[:_IMAGE_CHECK_CHARS], validate=True)
+    except ValueError:
+        return False
+    return True
+
 def _get_agent_response(updated_state):
     """Extracts the agent response and completion status from the state."""
     agent_response = ""
@@ -106,6 +113,9 @@ async def reset_session_state(sid: str):
     state = session_states[sid]
     # Clear state
     state["messages"] = []
+    state["conversation_lines"] = []
+    state["running_summary"] = ""
+    state["human_message_count"] = 0
     state["visitor_profile"] = {
         "name": None,
         "purpose": None,
@@ -137,10 +147,8 @@ async def connect(sid: str, environ: dict, auth: Any = None):
     await start_state_processor_if_needed()
 
     # Initialize session state and register active connection
-    async with sessions_lock:
-        initial_state = create_initial_state()
-        session_states[sid] = initial_state
-        active_connections[sid] = True
+    session_states[sid] = create_initial_state()
+    active_connections[sid] = True
 
     await sio.emit('status', {'msg': 'Connected to Security Gate System'}, to=sid)
     await sio.emit('session_ready', {'session_id': sid}, to=sid)
@@ -151,9 +159,10 @@ async def disconnect(sid: str):
     print(f"🔌 Client disconnected: {sid}")
 
     # Automatic cleanup
-    async with sessions_lock:
-        session_states.pop(sid, None)
-        active_connections.pop(sid, None)
+    session_states.pop(sid, None)
+    active_connections.pop(sid, None)
+    session_locks.pop(sid, None)
+    cameraSidMap.pop(sid, None)
 
 @sio.event
 async def send_message(sid: str, data: Dict[str, Any]):
@@ -164,11 +173,22 @@ async def send_message(sid: str, data: Dict[str, Any]):
         await sio.emit('error', {'msg': 'Graph not initialized'}, to=sid)
         return
 
-    async with sessions_lock:
-        if sid not in session_states:
-            await sio.emit('error', {'msg': 'Session not found'}, to=sid)
-            return
-        current_state = session_states[sid].copy()
+    if sid not in session_states:
+        await sio.emit('error', {'msg': 'Session not found'}, to=sid)
+        return
+
+    # Held for the whole turn, so a camera trigger and a visitor message for the
+    # same session run one after the other instead of overwriting each other
+    async with _session_lock(sid):
+        await _run_turn(sid, user_message)
+
+async def _run_turn(sid: str, user_message: str):
+    """Run one graph turn for a session; the caller holds the session's lock."""
+    # The client may have disconnected while waiting for the lock
+    if sid not in session_states:
+        await sio.emit('error', {'msg': 'Session not found'}, to=sid)
+        return
+    current_state = session_states[sid].copy()
 
     try:
         # Update state with user input
@@ -183,8 +203,8 @@ async def send_message(sid: str, data: Dict[str, Any]):
 
         print_state(updated_state)
 
-        # Update stored state
-        async with sessions_lock:
+        # Update stored state, unless the client disconnected during the turn
+        if sid in session_states:
             session_states[sid] = updated_state
 
         # Get response and completion status
@@ -219,11 +239,10 @@ async def send_message(sid: str, data: Dict[str, Any]):
 @sio.event
 async def get_profile(sid: str, data: Dict[str, Any]):
     """Get current visitor profile for a session."""
-    async with sessions_lock:
-        if sid not in session_states:
-            await sio.emit('error', {'msg': 'Session not found'}, to=sid)
-            return
-        current_state = session_states[sid]
+    if sid not in session_states:
+        await sio.emit('error', {'msg': 'Session not found'}, to=sid)
+        return
+    current_state = session_states[sid]
 
     profile_data = {
         "visitor_profile": current_state.get("visitor_profile", {}),
@@ -246,9 +265,16 @@ async def upload_image(sid: str, data: Dict[str, Any]):
         }, to=sid)
         return
 
+    if not isinstance(image_b64, str) or not _is_base64(image_b64):
+        await sio.emit('image_upload_response', {
+            "status": "error",
+            "message": "image must be a base64 string"
+        }, to=sid)
+        return
+
     try:
-        # Decode base64 image
-        image_data = base64.b64decode(image_b64)
+        # Queue the base64 string as received; the vision model takes base64
+        # anyway, so decoding here would only be re-encoded by the processor
         image_id = str(uuid.uuid4())
 
         # Safe queue operation with timeout
@@ -260,7 +286,7 @@ async def upload_image(sid: str, data: Dict[str, Any]):
                 except:
                     pass
 
-            image_queue.put_nowait({"id": image_id, "data": image_data, "timestamp": timestamp, "session_id": sid})
+            image_queue.put_nowait({"id": image_id, "image_b64": image_b64, "timestamp": timestamp, "session_id": sid})
             print(f"📸 Image {image_id} added to the queue. Queue size: {image_queue.qsize()}")
         except Exception as queue_error:
             await sio.emit('image_upload_response', {
@@ -281,8 +307,7 @@ async def upload_image(sid: str, data: Dict[str, Any]):
 @sio.event
 async def request_health_check(sid: str, _data: Dict[str, Any]):
     """Perform health check."""
-    async with sessions_lock:
-        active_sessions = len(session_states)
+    active_sessions = len(session_states)
     health_data = {
         "status": "healthy",
         "graph_initialized": shared_graph is not None,
@@ -293,23 +318,29 @@ async def request_health_check(sid: str, _data: Dict[str, Any]):
 @sio.event
 async def request_threat_logs(sid: str, data: Dict[str, Any]):
     """Get the threat detector logs."""
+    global _threat_log_cache
     log_file_path = "./data/logs/vision_data_log.json"
-    if not os.path.exists(log_file_path):
+    try:
+        stat = os.stat(log_file_path)
+    except FileNotFoundError:
         await sio.emit('error', {'msg': 'Log file not found.'}, to=sid)
         return
 
     try:
-        async with aiofiles.open(log_file_path, "r") as f:
-            content = await f.read()
-            if not content:
-                 await sio.emit('threat_logs', [], to=sid)
-                 return
-            log_data = json.loads(content)
+        # Only re-read and re-parse the log when the processor has rewritten it
+        cache_key = (stat.st_mtime_ns, stat.st_size)
+        if _threat_log_cache[0] == cache_key:
+            log_data = _threat_log_cache[1]
+        else:
+            async with aiofiles.open(log_file_path, "rb") as f:
+                content = await f.read()
+            log_data = orjson.loads(content) if content else []
+            _threat_log_cache = (cache_key, log_data)
 
         # Filter logs by session_id (now sid)
         session_logs = [log for log in log_data if log.get("session_id") == sid]
         await sio.emit('threat_logs', session_logs, to=sid)
-    except json.JSONDecodeError:
+    except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses it
         await sio.emit('error', {'msg': 'Invalid JSON format in log file.'}, to=sid)
     except Exception as e:
         await sio.emit('error', {'msg': f'Error reading log file: {str(e)}'}, to=sid)
@@ -338,7 +369,7 @@ async def getCameraList(sid: str, data: Dict[str, Any]):
         cameras_path = "data/db/cameras.json"
         async with aiofiles.open(cameras_path, "r") as f:
             content = await f.read()
-        cameras = json.loads(content)
+        cameras = orjson.loads(content)
         await sio.emit('cameraList', {'cameras': cameras}, to=sid)
     except FileNotFoundError:
         await sio.emit('error', {'msg': 'Cameras configuration not found'}, to=sid)
@@ -361,15 +392,14 @@ async def registerCamera(sid: str, data: Dict[str, Any]):
         cameras_path = "data/db/cameras.json"
         async with aiofiles.open(cameras_path, "r") as f:
             content = await f.read()
-        cameras = json.loads(content)
+        cameras = orjson.loads(content)
 
         if not any(cam['id'] == camera_id for cam in cameras):
             await sio.emit('error', {'msg': 'Invalid camera ID'}, to=sid)
             return
 
-        # Update mapping with thread safety
-        async with sessions_lock:
-            cameraSidMap[sid] = camera_id
+        # Update mapping
+        cameraSidMap[sid] = camera_id
 
         await sio.emit('cameraRegistered', {
             'camera_id': camera_id,
@@ -384,9 +414,8 @@ async def registerCamera(sid: str, data: Dict[str, Any]):
 
 async def send_to_sid(sid: str, event: str, data: Dict[str, Any]) -> bool:
     """Send event to specific client by sid. Returns True if sent successfully."""
-    async with sessions_lock:
-        if sid not in active_connections:
-            return False
+    if sid not in active_connections:
+        return False
     try:
         await sio.emit(event, data, to=sid)
         return True
@@ -400,13 +429,11 @@ async def send_to_all_active(event: str, data: Dict[str, Any]):
 
 async def get_active_sids() -> list[str]:
     """Get list of all active sids."""
-    async with sessions_lock:
-        return list(active_connections.keys())
+    return list(active_connections.keys())
 
 async def is_sid_active(sid: str) -> bool:
     """Check if sid is currently active."""
-    async with sessions_lock:
-        return sid in active_connections
+    return sid in active_connections
 
 async def emit_system_status(status_data: Dict[str, Any]):
     """Emit system status to all connected clients."""
@@ -449,7 +476,13 @@ async def process_socketio_events():
                         dummy_message = event_data.get("message", "I am here to visit someone")
 
                         if session_id:
-                            await send_message(session_id, {"message": dummy_message})
+                            # Run without awaiting so triggers for different sessions
+                            # reach Ollama concurrently and don't stall the event loop
+                            task = asyncio.create_task(
+                                send_message(session_id, {"message": dummy_message})
+                            )
+                            graph_tasks.add(task)
+                            task.add_done_callback(graph_tasks.discard)
                             print(f"📢 Triggered langgraph for high threat level in session {session_id}")
 
                     events_processed += 1
@@ -473,6 +506,40 @@ async def start_event_processor_if_needed():
 
 _state_processor_started = False
 
+async def _apply_state_update(session_id: str, updates: Dict[str, Any]):
+    """Apply an image processor state update once the session's lock is free."""
+    if session_id not in session_states:
+        return
+
+    async with _session_lock(session_id):
+        # The client may have disconnected while waiting for the lock
+        if session_id not in session_states:
+            return
+
+        # Check if session_active is being updated
+        if "session_active" in updates:
+            old_active = session_states[session_id].get("session_active")
+            new_active = updates["session_active"]
+
+            # Send message if status changed
+            if old_active != new_active:
+                if new_active:
+                    await sio.emit('chat_response', {
+                        "agent_response": "Dur yolcu, sen kimsin!",
+                        "session_complete": False
+                    }, to=session_id)
+                else:
+                    await sio.emit('chat_response', {
+                        "agent_response": "Tekrar görüşecez...",
+                        "session_complete": False
+                    }, to=session_id)
+
+                    # Immediately reset conversation state
+                    await reset_session_state(session_id)
+
+        session_states[session_id].update(updates)
+        print(f"🔄 Updated state for session {session_id}: {updates}")
+
 async def process_state_requests():
     """Background task to handle state requests from image processor."""
     while True:
@@ -488,31 +555,13 @@ async def process_state_requests():
 
                     if action == "update" and session_id:
                         updates = request.get("updates", {})
-                        async with sessions_lock:
-                            if session_id in session_states:
-                                # Check if session_active is being updated
-                                if "session_active" in updates:
-                                    old_active = session_states[session_id].get("session_active")
-                                    new_active = updates["session_active"]
-
-                                    # Send message if status changed
-                                    if old_active != new_active:
-                                        if new_active:
-                                            await sio.emit('chat_response', {
-                                                "agent_response": "Dur yolcu, sen kimsin!",
-                                                "session_complete": False
-                                            }, to=session_id)
-                                        else:
-                                            await sio.emit('chat_response', {
-                                                "agent_response": "Tekrar görüşecez...",
-                                                "session_complete": False
-                                            }, to=session_id)
-
-                                            # Immediately reset conversation state
-                                            await reset_session_state(session_id)
-
-                                session_states[session_id].update(updates)
-                                print(f"🔄 Updated state for session {session_id}: {updates}")
+                        # Applied under the session's lock, without blocking this
+                        # loop while a graph turn for that session is running
+                        task = asyncio.create_task(
+                            _apply_state_update(session_id, updates)
+                        )
+                        state_update_tasks.add(task)
+                        task.add_done_callback(state_update_tasks.discard)
 
                     requests_processed += 1
                 except:
@@ -533,40 +582,48 @@ async def start_state_processor_if_needed():
 
 
 def print_state(state):
-    """Print State object in a concise format"""
-    print("=== State ===")
-    print(f"Session Active: {state.get('session_active', False)}")
-    print(f"User Input: {state.get('user_input', '')}")
-    print(f"Invalid Input: {state.get('invalid_input', False)}")
+    """Log State object in a concise format, as one write and only at DEBUG level"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
+    lines = [
+        "=== State ===",
+        f"Session Active: {state.get('session_active', False)}",
+        f"User Input: {state.get('user_input', '')}",
+        f"Invalid Input: {state.get('invalid_input', False)}",
+    ]
 
     # Visitor Profile
     profile = state.get('visitor_profile', {})
     if profile:
-        print("\n--- Visitor Profile ---")
-        for key, value in profile.items():
-            print(f"{key}: {value}")
+        lines.append("\n--- Visitor Profile ---")
+        lines.extend(f"{key}: {value}" for key, value in profile.items())
 
     # Vision Analysis
     vision = state.get('vision_schema')
     if vision:
-        print("\n--- Vision Analysis ---")
-        print(f"Face Detected: {vision.get('face_detected')}")
-        print(f"Angry Face: {vision.get('angry_face')}")
-        print(f"Dangerous Object: {vision.get('dangerous_object')}")
-        print(f"Threat Level: {vision.get('threat_level')}")
-        print(f"Details: {vision.get('details')}")
+        lines.extend([
+            "\n--- Vision Analysis ---",
+            f"Face Detected: {vision.get('face_detected')}",
+            f"Angry Face: {vision.get('angry_face')}",
+            f"Dangerous Object: {vision.get('dangerous_object')}",
+            f"Threat Level: {vision.get('threat_level')}",
+            f"Details: {vision.get('details')}",
+        ])
 
     # Decision
-    print(f"\n--- Decision ---")
-    print(f"Decision: {state.get('decision', 'N/A')}")
-    print(f"Confidence: {state.get('decision_confidence', 'N/A')}")
-    print(f"Reasoning: {state.get('decision_reasoning', 'N/A')}")
+    lines.extend([
+        "\n--- Decision ---",
+        f"Decision: {state.get('decision', 'N/A')}",
+        f"Confidence: {state.get('decision_confidence', 'N/A')}",
+        f"Reasoning: {state.get('decision_reasoning', 'N/A')}",
+    ])
 
     # Messages
     messages = state.get('messages', [])
-    print(f"\n--- Messages ({len(messages)} item(s)) ---")
+    lines.append(f"\n--- Messages ({len(messages)} item(s)) ---")
     for i, msg in enumerate(messages):
-        if hasattr(msg, 'content'):  # LangChain message object
-            print(f"{i+1}. {msg.content}")
-        else:  # Regular string or dict
-            print(f"{i+1}. {msg}")
+        # LangChain message object, or a regular string or dict
+        lines.append(f"{i+1}. {getattr(msg, 'content', msg)}")
+
+    logger.debug("\n".join(lines))
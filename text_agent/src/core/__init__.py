@@ -1,10 +1,15 @@
 # Core package
 from src.core.state import VisitorProfile, State
-from src.core.graph import create_security_graph, create_initial_state
+from src.core.graph import (
+    create_security_graph,
+    get_security_graph,
+    create_initial_state,
+)
 
 __all__ = [
     "VisitorProfile",
     "State",
     "create_security_graph",
+    "get_security_graph",
     "create_initial_state",
 ]
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import SystemMessage
 from src.core.state import State
@@ -53,7 +54,7 @@ def create_security_graph():
     # TODO: Fix the graph to use auth and auth seperately and give feedback properly.
     def check_auth(state: State,) -> Literal["authenticated", "not_authenticated"]:
         name = state["visitor_profile"]["name"]
-        if authenticate(name):
+        if name and authenticate(name):
             state["visitor_profile"]["authenticated"] = True
             return "authenticated"
         state["visitor_profile"]["authenticated"] = False
@@ -73,7 +74,8 @@ def create_security_graph():
         if threat_level_value == "high":
             return "call_security"
 
-        session_result = detect_session(state)
+        # Usually already detected concurrently with validation in receive_input
+        session_result = state.get("session_type") or detect_session(state)
         if session_result == "new":
             return "reset_conversation"
         else:  # same session
@@ -130,6 +132,17 @@ def create_security_graph():
     return graph_builder.compile()
 
 
+@lru_cache(maxsize=1)
+def get_security_graph():
+    """
+    Get the shared compiled security gate graph, compiling it on first use.
+
+    Returns:
+        StateGraph: Compiled graph shared by all callers
+    """
+    return create_security_graph()
+
+
 def create_initial_state() -> State:
     """
     Create the initial state for a new security gate session.
@@ -145,6 +158,9 @@ def create_initial_state() -> State:
 
     return {
         "messages": initial_messages,
+        "conversation_lines": [],
+        "running_summary": "",
+        "human_message_count": 0,
         "visitor_profile": {
             "name": None,
             "purpose": None,
@@ -163,4 +179,5 @@ def create_initial_state() -> State:
         "invalid_input": False,
         "session_active": False,
         "session_id": None,
+        "session_type": None,
     }
@@ -23,6 +23,9 @@ class VisionSchema(TypedDict):
 
 class State(TypedDict):
     messages: list
+    conversation_lines: list  # "type: content" line per message, see sync_conversation_lines
+    running_summary: str  # summary of everything before the recent messages
+    human_message_count: int  # human messages currently in messages
     visitor_profile: VisitorProfile
     decision: str
     decision_confidence: Optional[float]
@@ -33,3 +36,4 @@ class State(TypedDict):
     invalid_input: bool
     session_active: bool
     session_id: Optional[str]
+    session_type: Optional[str]  # "same"/"new", detected alongside input validation
@@ -1,15 +1,43 @@
 from typing import Literal
 import json
+import logging
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.prebuilt import ToolNode
 from src.core.state import State
 from data.contacts import CONTACTS
-from src.utils.extraction import extract_answer_from_thinking_model
+from src.utils.extraction import parse_json_response
+from src.utils.conversation import sync_conversation_lines
 from models.llm_config import llm_email, llm_decision_json
 from src.tools.communication import tools
 from src.utils.prompt_manager import prompt_manager
 from src.utils.auth import get_greeting
 
+logger = logging.getLogger(__name__)
+
+# Executes the email tool calls; stateless, so one instance serves every notification
+_TOOL_NODE = ToolNode(tools=tools)
+
+# Available decisions are static, so render the numbered prompt list once
+_DECISIONS = prompt_manager.get_data("decision", "available_decisions")
+_DECISIONS_LIST = "\n".join(
+    [
+        f"{i+1}. {decision_id} - {description}"
+        for i, (decision_id, description) in enumerate(_DECISIONS.items())
+    ]
+)
+
+# Decoding is constrained to the fields make_decision reads, with the decision
+# limited to the known ids
+_DECISION_FORMAT = {
+    "type": "object",
+    "properties": {
+        "decision": {"type": "string", "enum": list(_DECISIONS)},
+        "confidence": {"type": "number"},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["decision", "confidence", "reasoning"],
+}
+
 
 def make_decision(state: State) -> State:
     """
@@ -18,14 +46,15 @@ def make_decision(state: State) -> State:
     """
 
     profile = state["visitor_profile"]
-    messages = state["messages"]
     if state["vision_schema"] is None:
         raise ValueError("Vision schema is missing")
 
     threat_level_value = state["vision_schema"]["threat_level"]
     is_authenticated = state["visitor_profile"]["authenticated"]
 
-    if threat_level_value == "high":
+    # A high threat seen by the camera or gathered from the conversation is
+    # decided without the LLM
+    if threat_level_value == "high" or profile["threat_level"] == "high":
         state["decision"] = "call_security"
         state["agent_response"] = "Security called"
         return state
@@ -37,7 +66,7 @@ def make_decision(state: State) -> State:
 
         sid = state.get("session_id")
         if not sid:
-            print("Debug: Graph couldnt get sid from state!")
+            logger.debug("Graph couldnt get sid from state!")
             sid = ""
         current_door = cameraSidMap[sid]
         name = state["visitor_profile"]["name"]
@@ -59,27 +88,10 @@ def make_decision(state: State) -> State:
 
     # Get recent conversation context for decision making
     conversation_text = "\n".join(
-        [
-            f"{msg.type}: {msg.content}"
-            for msg in messages[-10:]  # Last 10 messages for context
-            if hasattr(msg, "type") and hasattr(msg, "content")
-        ]
+        sync_conversation_lines(state)[-10:]  # Last 10 messages for context
     )
 
-    # Define available decisions from prompt manager
-    decisions = prompt_manager.get_data("decision", "available_decisions")
-
     # Create decision prompt using prompt manager with JSON schema
-    decisions_list = "\n".join(
-        [
-            f"{i+1}. {decision_id} - {description}"
-            for i, (decision_id, description) in enumerate(decisions.items())
-        ]
-    )
-
-    # Get JSON schema from prompt manager
-    decision_schema = prompt_manager.get_schema("decision_schema")
-
     prompt_value = prompt_manager.invoke_prompt(
         "decision",
         "make_decision_json",
@@ -89,34 +101,21 @@ def make_decision(state: State) -> State:
         profile_threat_level=profile["threat_level"],
         profile_affiliation=profile["affiliation"],
         profile_id_verified=profile["id_verified"],
-        decisions_list=decisions_list,
+        decisions_list=_DECISIONS_LIST,
         conversation_text=conversation_text,
-        json_schema=json.dumps(decision_schema, indent=2),
+        json_schema=prompt_manager.get_schema_text("decision_schema"),
     )
 
     try:
-        response = llm_decision_json.invoke(prompt_value)
-
-        # Handle response content properly - it might be a string or have .content attribute
-        if hasattr(response, "content"):
-            content = response.content
-        else:
-            content = str(response)
-
-        content = extract_answer_from_thinking_model(response)
-
-        # Ensure content is a string for JSON parsing
-        if isinstance(content, str):
-            decision_data = json.loads(content)
-        else:
-            raise ValueError("Response content is not a string")
+        response = llm_decision_json.invoke(prompt_value, format=_DECISION_FORMAT)
+        decision_data = parse_json_response(response)
 
         # Validate decision is one of the allowed options
         decision_result = decision_data.get("decision", "").strip().lower()
         confidence = decision_data.get("confidence", 0.0)
         reasoning = decision_data.get("reasoning", "No reasoning provided")
 
-        if decision_result in decisions.keys():
+        if decision_result in _DECISIONS:
             state["decision"] = decision_result
             state["decision_confidence"] = confidence
             state["decision_reasoning"] = reasoning
@@ -128,14 +127,14 @@ def make_decision(state: State) -> State:
             )
             state["agent_response"] = message_content
 
-            print(f"🔒 Security Decision: {decision_result.upper()}")
-            print(f"📊 Confidence: {confidence:.2f}")
-            print(f"📋 Reason: {reasoning}")
+            logger.info("🔒 Security Decision: %s", decision_result.upper())
+            logger.debug("📊 Confidence: %.2f", confidence)
+            logger.debug("📋 Reason: %s", reasoning)
 
             return state
 
         # Fallback if invalid decision
-        print(
+        logger.warning(
             "⚠️ Decision making: Invalid decision in JSON response, defaulting to deny_request"
         )
         state["decision"] = "deny_request"
@@ -147,7 +146,7 @@ def make_decision(state: State) -> State:
         return state
 
     except (json.JSONDecodeError, KeyError, Exception) as error:
-        print(f"⚠️ Decision making error: {error}")
+        logger.warning("⚠️ Decision making error: %s", error)
         # Set default fallback decision
         state["decision"] = "deny_request"
         state["decision_confidence"] = 0.0
@@ -199,17 +198,16 @@ def notify_contact(state: State) -> State:
             # Check if there are tool calls to execute
             tool_calls = getattr(response, "tool_calls", None)
             if tool_calls:
-                tool_node = ToolNode(tools=tools)
                 # Execute the tool calls
-                tool_node.invoke({"messages": [response]})
+                _TOOL_NODE.invoke({"messages": [response]})
 
                 success_message = prompt_manager.get_data(
                     "communication", "notification_messages"
                 )["success"]
                 state["agent_response"] = success_message.format(contact_name=contact_name)
-                print(f"✅ Email notification sent to {contact_name}")
+                logger.info("✅ Email notification sent to %s", contact_name)
             else:
-                print(f"⚠️ Failed to send email notification to {contact_name}")
+                logger.warning("⚠️ Failed to send email notification to %s", contact_name)
                 failure_message = prompt_manager.get_data(
                     "communication", "notification_messages"
                 )["failure"]
@@ -218,7 +216,7 @@ def notify_contact(state: State) -> State:
                 )
 
         except Exception as error:
-            print(f"⚠️ Email notification error: {error}")
+            logger.warning("⚠️ Email notification error: %s", error)
             failure_message = prompt_manager.get_data(
                 "communication", "notification_messages"
             )["failure"]
@@ -226,7 +224,7 @@ def notify_contact(state: State) -> State:
                 AIMessage(content=failure_message.format(contact_name=contact_name))
             )
     else:
-        print("ℹ️ No valid contact person found for email notification")
+        logger.info("ℹ️ No valid contact person found for email notification")
         no_contact_message = prompt_manager.get_data(
             "communication", "notification_messages"
         )["no_contact"]
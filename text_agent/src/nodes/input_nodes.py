@@ -1,13 +1,21 @@
-from typing import Literal
+from typing import Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
 import json
+import logging
 import os
+import re
+import string
 from typing import cast
 from src.core.state import VisionSchema
 from langchain_core.messages import HumanMessage, SystemMessage
 from src.core.state import State
 from src.utils.llm_utilities import analyze_image_with_prompt
-from config.settings import MAX_HUMAN_MESSAGES, SHORTEN_KEEP_MESSAGES
-from src.utils.extraction import extract_answer_from_thinking_model
+from config.settings import (
+    MAX_HUMAN_MESSAGES,
+    SHORTEN_KEEP_MESSAGES,
+    VALIDATION_CACHE_SIZE,
+)
+from src.utils.extraction import extract_answer_from_thinking_model, parse_json_response
 from models.llm_config import (
     llm_summary,
     llm_session_json,
@@ -15,6 +23,97 @@ from models.llm_config import (
 )
 from langchain_core.messages import AIMessage
 from src.utils.prompt_manager import prompt_manager
+from src.utils.cache import LRUCache
+from src.utils.conversation import sync_conversation_lines
+from data.contacts import CONTACTS
+
+logger = logging.getLogger(__name__)
+
+# "valid" verdicts keyed by normalized input. Validation only looks at the
+# input itself, so repeated greetings and names skip the LLM call. The
+# validation model samples, so a refusal is never cached and gets a fresh call.
+_validation_cache = LRUCache(maxsize=VALIDATION_CACHE_SIZE)
+
+
+# Words that are always relevant at the gate; input made only of these is valid
+_KNOWN_WORDS = frozenset(
+    [
+        *prompt_manager.get_field_data("input_validation")["known_words"],
+        *(
+            word.casefold()
+            for phrase in [*prompt_manager.get_field_data("greetings"), *CONTACTS]
+            for word in phrase.split()
+        ),
+    ]
+)
+_WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?")
+
+# Verdict words the validation prompt asks for; "unrelated" wins if both appear
+_VERDICT_RE = re.compile(r"unrelated|valid")
+
+# Session detection only reads session_type, so decoding is constrained to it
+_SESSION_FORMAT = {
+    "type": "object",
+    "properties": {"session_type": {"type": "string", "enum": ["same", "new"]}},
+    "required": ["session_type"],
+}
+
+# Marks the system message that carries the running conversation summary
+_SUMMARY_PREFIX = "[CONVERSATION SUMMARY: "
+
+
+def _normalize_input(user_input: str) -> str:
+    """
+    Normalize user input so trivially different phrasings share a cache entry.
+    """
+    return " ".join(user_input.casefold().split()).strip(string.punctuation + " ")
+
+
+def _quick_validate(normalized_input: str) -> Optional[str]:
+    """
+    Settle obvious cases without the validation model.
+
+    Args:
+        normalized_input: Input as returned by _normalize_input
+
+    Returns:
+        str: "valid" or "unrelated", or None when the model has to decide
+    """
+    # Nothing but punctuation/symbols, or control characters
+    if not normalized_input or not normalized_input.isprintable():
+        return "unrelated"
+
+    words = _WORD_RE.findall(normalized_input)
+    if words and all(word in _KNOWN_WORDS for word in words):
+        return "valid"
+    return None
+
+
+def _classify_validation(result: str) -> str:
+    """
+    Reduce a validation response to "valid", "unrelated" or "unclear" in one scan.
+    """
+    verdicts = set(_VERDICT_RE.findall(result))
+    if "unrelated" in verdicts:
+        return "unrelated"
+    return "valid" if verdicts else "unclear"
+
+
+def _append_user_message(state: State, user_input: str) -> None:
+    """
+    Append the visitor's message and keep the running human message count in sync.
+    """
+    state["messages"].append(HumanMessage(content=user_input))
+    state["human_message_count"] = state.get("human_message_count", 0) + 1
+
+
+def _count_human_messages(messages: list) -> int:
+    """
+    Count human messages in a message list.
+    """
+    return sum(
+        1 for message in messages if hasattr(message, "type") and message.type == "human"
+    )
 
 
 def receive_input(state: State) -> State:
@@ -25,41 +124,76 @@ def receive_input(state: State) -> State:
     # Basic check for empty input
     user_input = state.get("user_input", "")
     state["invalid_input"] = False
+    state["session_type"] = None
 
     if not user_input.strip():
-        print("❌ Input validation: Empty input detected")
+        logger.info("❌ Input validation: Empty input detected")
         state["invalid_input"] = True
         empty_message = prompt_manager.get_field_data("input_validation")[
             "empty_input_message"
         ]
-        print(f"Agent: {empty_message}")
+        logger.info("Agent: %s", empty_message)
 
         return state
 
     # Create a validation prompt using prompt manager
     try:
-        # Use prompt manager to get validation prompt
-        prompt_value = prompt_manager.invoke_prompt(
-            "input", "validate_input", user_input=user_input
+        cache_key = _normalize_input(user_input)
+        verdict = _quick_validate(cache_key) or _validation_cache.get(cache_key)
+
+        if verdict is None:
+            # The router needs session detection for valid input in an active,
+            # non-high-threat session, so overlap it with the validation call
+            vision_data = state.get("vision_schema") or {}
+            needs_session = (
+                state.get("session_active") and vision_data.get("threat_level") != "high"
+            )
+            # One thread for this turn only, so concurrent sessions never queue
+            # behind each other. Leaving the block waits for detection, which
+            # also updates the conversation lines in state.
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="session") as executor:
+                session_future = (
+                    executor.submit(detect_session, state, user_input)
+                    if needs_session
+                    else None
+                )
+                try:
+                    # Use prompt manager to get validation prompt
+                    prompt_value = prompt_manager.invoke_prompt(
+                        "input", "validate_input", user_input=user_input
+                    )
+
+                    response = llm_validation_json.invoke(prompt_value)
+
+                    # Extract the response content (handling thinking models)
+                    result = extract_answer_from_thinking_model(response)
+                    verdict = _classify_validation(result)
+                    if verdict == "valid":
+                        _validation_cache.put(cache_key, verdict)
+                finally:
+                    # Also kept when validation fails, as that defaults to valid
+                    # and the router would otherwise detect the session again
+                    if session_future is not None and verdict != "unrelated":
+                        state["session_type"] = session_future.result()
+
+        logger.debug(
+            "🗄️ Validation cache: %d hits, %d misses",
+            _validation_cache.hits,
+            _validation_cache.misses,
         )
 
-        response = llm_validation_json.invoke(prompt_value)
-
-        # Extract the response content (handling thinking models)
-        result = extract_answer_from_thinking_model(response)
-
         # Clean the response - sometimes LLM adds extra text
-        if "valid" in result and "unrelated" not in result:
-            print("✅ Input validation: Input is valid")
-            state["messages"].append(HumanMessage(content=user_input))
+        if verdict == "valid":
+            logger.debug("✅ Input validation: Input is valid")
+            _append_user_message(state, user_input)
 
-        elif "unrelated" in result:
-            print("❌ Input validation: Input is unrelated/invalid")
+        elif verdict == "unrelated":
+            logger.info("❌ Input validation: Input is unrelated/invalid")
             invalid_message = prompt_manager.get_field_data("input_validation")[
                 "invalid_input_message"
             ]
 
-            print(f"Agent: {invalid_message}")
+            logger.info("Agent: %s", invalid_message)
 
             message = AIMessage(content=f"Agent: {invalid_message}")
             state["agent_response"] =  f"Agent: {invalid_message}"
@@ -68,38 +202,40 @@ def receive_input(state: State) -> State:
             return state
         else:
             # Default to valid if unclear response
-            print("⚠️ Input validation: Unclear response, defaulting to valid")
-            state["messages"].append(HumanMessage(content=user_input))
+            logger.warning("⚠️ Input validation: Unclear response, defaulting to valid")
+            _append_user_message(state, user_input)
 
     except Exception as error:
-        print(f"⚠️ Input validation error: {error}")
+        logger.warning("⚠️ Input validation error: %s", error)
         # If validation fails, default to valid to avoid blocking legitimate users
-        state["messages"].append(HumanMessage(content=user_input))
+        _append_user_message(state, user_input)
 
     return state
 
-def detect_session(state: State) -> Literal["same", "new"]:
+def detect_session(
+    state: State, new_user_message: Optional[str] = None
+) -> Literal["same", "new"]:
     """
     Detects if the current input is from a new visitor or the same visitor using structured JSON output.
     Uses LLM to analyze conversation patterns and detect session changes.
+
+    Args:
+        state: Current graph state
+        new_user_message: User message not yet appended to state["messages"].
+            Defaults to the last message in the history.
     """
-    messages = state["messages"]
+    lines = sync_conversation_lines(state)
 
     # Get the last user message and some conversation context
-    last_user_message = messages[-1].content
+    if new_user_message is None:
+        last_user_message = state["messages"][-1].content
+    else:
+        last_user_message = new_user_message
+        lines = lines + [f"human: {new_user_message}"]
 
     # Get recent conversation context (last 6 messages to keep it manageable)
-    recent_messages = messages[-6:] if len(messages) >= 6 else messages[1:]
-    conversation_context = "\n".join(
-        [
-            f"{msg.type}: {msg.content}"
-            for msg in recent_messages
-            if hasattr(msg, "type") and hasattr(msg, "content")
-        ]
-    )
-
-    # Get JSON schema from prompt manager
-    session_schema = prompt_manager.get_schema("session_schema")
+    recent_lines = lines[-6:] if len(lines) >= 6 else lines[1:]
+    conversation_context = "\n".join(recent_lines)
 
     # Format visitor profile for prompt
     visitor_profile = state.get("visitor_profile", {})
@@ -118,23 +254,11 @@ def detect_session(state: State) -> Literal["same", "new"]:
             conversation_context=conversation_context,
             visitor_profile_text=visitor_profile_text,
             last_user_message=last_user_message,
-            json_schema=json.dumps(session_schema, indent=2),
+            json_schema=prompt_manager.get_schema_text("session_schema"),
         )
 
-        response = llm_session_json.invoke(prompt_value)
-
-        # Handle response content properly
-        if hasattr(response, "content"):
-            content = response.content
-        else:
-            content = str(response)
-
-        content = extract_answer_from_thinking_model(content)
-
-        if isinstance(content, str):
-            session_data = json.loads(content)
-        else:
-            raise ValueError("Response content is not a string")
+        response = llm_session_json.invoke(prompt_value, format=_SESSION_FORMAT)
+        session_data = parse_json_response(response)
 
         session_type = session_data.get("session_type", "same").lower()
 
@@ -145,7 +269,7 @@ def detect_session(state: State) -> Literal["same", "new"]:
             return "same"
 
     except (json.JSONDecodeError, KeyError, Exception) as error:
-        print(f"⚠️ JSON session detection failed: {error}")
+        logger.warning("⚠️ JSON session detection failed: %s", error)
         return "same"
 
 
@@ -155,21 +279,23 @@ def check_context_length(state: State) -> Literal["over_limit", "under_limit"]:
     Limits conversation to x human messages to keep context manageable.
     """
 
-    # Count human messages
-    human_message_count = 0
-    for message in state["messages"]:
-        if hasattr(message, "type") and message.type == "human":
-            human_message_count += 1
+    # Running count kept by receive_input, so the history isn't rescanned every turn
+    human_message_count = state.get("human_message_count")
+    if human_message_count is None:
+        human_message_count = _count_human_messages(state["messages"])
+        state["human_message_count"] = human_message_count
 
     # Check against threshold
     if human_message_count > MAX_HUMAN_MESSAGES:
-        print(
-            f"⚠️ Context length: {human_message_count} human messages exceeds limit of {MAX_HUMAN_MESSAGES}"
+        logger.warning(
+            "⚠️ Context length: %d human messages exceeds limit of %d",
+            human_message_count,
+            MAX_HUMAN_MESSAGES,
         )
         return "over_limit"
 
-    print(
-        f"✅ Context length: {human_message_count}/{MAX_HUMAN_MESSAGES} human messages"
+    logger.debug(
+        "✅ Context length: %d/%d human messages", human_message_count, MAX_HUMAN_MESSAGES
     )
     return "under_limit"
 
@@ -190,7 +316,7 @@ def summarize(state: State) -> State:
     if len(messages) < 8:
         return state
 
-    print(f"🔄 History management mode: {CURRENT_HISTORY_MODE}")
+    logger.info("🔄 History management mode: %s", CURRENT_HISTORY_MODE)
 
     if CURRENT_HISTORY_MODE == "shorten":
         return _shorten_history(state)
@@ -235,18 +361,15 @@ def _shorten_history(state: State) -> State:
     # Add recent messages
     new_messages.extend(recent_messages)
 
-    # Clear existing messages by popping them one by one
-    messages_to_remove = len(state["messages"])
-    for _ in range(messages_to_remove):
-        if len(state["messages"]) > 0:
-            state["messages"].pop(0)
+    # Replace the history in place with a single slice assignment; messages is
+    # the same list, so take its length first
+    original_count = len(messages)
+    state["messages"][:] = new_messages
+    state["conversation_lines"] = []
+    state["human_message_count"] = _count_human_messages(new_messages)
 
-    # Add new messages one by one
-    for message in new_messages:
-        state["messages"].append(message)
-
-    print(
-        f"Shortened conversation from {len(messages)} to {len(new_messages)} messages"
+    logger.info(
+        "Shortened conversation from %d to %d messages", original_count, len(new_messages)
     )
 
     return state
@@ -272,25 +395,37 @@ def _summarize_history(state: State) -> State:
         None,
     )
 
-    # Prepare conversation for summarization
-    conversation_to_summarize = messages[1:-4] if system_message else messages[:-4]
+    # Prepare only the messages added since the last summary; the previous
+    # summary message is folded in through running_summary instead
+    lines = sync_conversation_lines(state)
+    lines_to_summarize = lines[1:-4] if system_message else lines[:-4]
     conversation_text = "\n".join(
         [
-            f"{msg.type}: {msg.content}"
-            for msg in conversation_to_summarize
-            if hasattr(msg, "type") and hasattr(msg, "content")
+            line
+            for line in lines_to_summarize
+            if not line.startswith(f"system: {_SUMMARY_PREFIX}")
         ]
     )
+    running_summary = state.get("running_summary", "")
 
     try:
-        # Use prompt manager for summarization
-        prompt_value = prompt_manager.invoke_prompt(
-            "input", "summarize_conversation", conversation_text=conversation_text
-        )
+        # Use prompt manager for summarization, extending the running summary if there is one
+        if running_summary:
+            prompt_value = prompt_manager.invoke_prompt(
+                "input",
+                "update_conversation_summary",
+                previous_summary=running_summary,
+                conversation_text=conversation_text,
+            )
+        else:
+            prompt_value = prompt_manager.invoke_prompt(
+                "input", "summarize_conversation", conversation_text=conversation_text
+            )
 
         # Use the centralized summary LLM
         response = llm_summary.invoke(prompt_value)
         summary = extract_answer_from_thinking_model(response)
+        state["running_summary"] = summary
 
         # Create a new condensed message list
         new_messages = []
@@ -298,29 +433,28 @@ def _summarize_history(state: State) -> State:
             new_messages.append(system_message)
 
         # Add summary as system message
-        new_messages.append(SystemMessage(content=f"[CONVERSATION SUMMARY: {summary}]"))
+        new_messages.append(SystemMessage(content=f"{_SUMMARY_PREFIX}{summary}]"))
 
         # Add recent messages
         new_messages.extend(recent_messages)
 
-        # Clear existing messages by popping them one by one
-        messages_to_remove = len(state["messages"])
-        for _ in range(messages_to_remove):
-            if len(state["messages"]) > 0:
-                state["messages"].pop(0)
-
-        # Add new messages one by one
-        for message in new_messages:
-            state["messages"].append(message)
-
-        print(
-            f"✅ Summarized conversation from {len(messages)} to {len(new_messages)} messages"
+        # Replace the history in place with a single slice assignment; messages
+        # is the same list, so take its length first
+        original_count = len(messages)
+        state["messages"][:] = new_messages
+        state["conversation_lines"] = []
+        state["human_message_count"] = _count_human_messages(new_messages)
+
+        logger.info(
+            "✅ Summarized conversation from %d to %d messages",
+            original_count,
+            len(new_messages),
         )
 
         return state
 
     except Exception as error:
-        print(f"⚠️ Summarization error: {error}")
+        logger.warning("⚠️ Summarization error: %s", error)
         # On error, don't modify messages
         return state
 
@@ -331,6 +465,9 @@ def _clear_state(state: State):
     """
     # Clear messages
     state["messages"] = []
+    state["conversation_lines"] = []
+    state["running_summary"] = ""
+    state["human_message_count"] = 0
     # Reset visitor profile
     state["visitor_profile"] = {
         "name": None,
@@ -364,5 +501,5 @@ def reset_conversation(state: State) -> State:
     #if agent_feedback:
     #    state["agent_response"] = "debug reset state"
 
-    print("🔄 Reset conversation: Properly cleared state for new visitor")
+    logger.info("🔄 Reset conversation: Properly cleared state for new visitor")
     return state
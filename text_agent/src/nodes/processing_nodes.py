@@ -1,78 +1,240 @@
-from typing import Literal
+from typing import Dict, Literal, Optional, Tuple
+from difflib import get_close_matches
+from functools import lru_cache
 from src.utils.auth import authenticate
 import json
+import logging
+import re
 from langchain_core.messages import AIMessage
 from src.core.state import State
 from data.contacts import CONTACTS
 from models.llm_config import llm_profiler_json
+from src.utils.extraction import parse_json_response
+from src.utils.conversation import sync_conversation_lines
 from src.utils.prompt_manager import prompt_manager
 
+logger = logging.getLogger(__name__)
 
-def check_visitor_profile_node(state: State) -> State:
-    """
-    Node function that performs LLM extraction and updates the visitor profile using structured JSON output.
-    """
-    # Get current conversation context
-    messages = state["messages"]
-    conversation_text = "\n".join(
-        [
-            f"{msg.type}: {msg.content}"
-            for msg in messages
-            if hasattr(msg, "type") and hasattr(msg, "content")
-        ]
-    )
+# Fields extracted from the conversation (threat_level is handled by vision analysis)
+_FIELDS_TO_EXTRACT = ("name", "purpose", "contact_person", "affiliation")
 
-    # Define fields to extract (excluding threat_level, which is handled by vision analysis)
-    fields_to_extract = [
-        "name",
-        "purpose",
-        "contact_person",
-        "affiliation",
-    ]
+# Fields that must be filled for a complete profile, in questioning order
+_PROFILE_FIELDS = ("name", "purpose", "contact_person", "threat_level", "affiliation")
 
-    # Check which fields are missing (excluding threat_level)
-    missing_fields = [
-        field for field in fields_to_extract if state["visitor_profile"][field] is None
-    ]
-
-    if not missing_fields:
-        print("✅ All fields already extracted")
-        return state
+# The follow-up questions are static, so render their text once. Messages are
+# mutable and kept in each session's history, so a fresh one is built per ask.
+_QUESTION_TEXTS = {
+    field: prompt_manager.get_field_question(
+        field, known_contacts=", ".join(CONTACTS.keys())
+    )
+    if field == "contact_person"
+    else prompt_manager.get_field_question(field)
+    for field in _PROFILE_FIELDS
+}
+_FALLBACK_QUESTION_TEXT = prompt_manager.get_field_data("input_validation")[
+    "fallback_question"
+]
+
+# A message that is nothing but a greeting has nothing to extract
+_GREETINGS = "|".join(
+    re.escape(greeting) for greeting in prompt_manager.get_field_data("greetings")
+)
+_GREETING_RE = re.compile(rf"^\W*(?:{_GREETINGS})\W*$", re.IGNORECASE)
+
+# Known contacts indexed by casefolded full name and by first name, so a
+# validated contact is a dict lookup instead of a scan over CONTACTS
+_CONTACTS_BY_NAME = {contact.casefold(): contact for contact in CONTACTS}
+_CONTACTS_BY_FIRST_NAME = {
+    contact.split()[0].casefold(): contact for contact in CONTACTS
+}
+
+# Unambiguous phrasings that are answered without the LLM; everything else
+# ("I am ...", purposes, affiliations) is left to it. Only the keywords are
+# case-insensitive. Names are one to three capitalized words made of letters
+# only, and the phrase has to end the clause, so "Ahmet. I want..." yields
+# "Ahmet" and "My friend" or "Necati Bey's" are left to the LLM.
+_NAME_WORD = r"[A-ZÇĞİÖŞÜ][a-zçğıöşü]+(?:-[A-ZÇĞİÖŞÜ][a-zçğıöşü]+)?"
+_CAPITALIZED_WORDS = rf"{_NAME_WORD}(?: {_NAME_WORD}){{0,2}}"
+_CLAUSE_END = r"(?=[ \t]*(?:[.!?,;\n]|$))"
+_KNOWN_CONTACTS = "|".join(re.escape(contact) for contact in CONTACTS)
+_FIRST_PASS_PATTERNS = {
+    "name": re.compile(rf"\b(?i:my name is)\s+({_CAPITALIZED_WORDS}){_CLAUSE_END}"),
+    "contact_person": re.compile(
+        rf"\b(?i:meet|see|visit|visiting)\s+(?i:({_KNOWN_CONTACTS}))(?!\w)"
+    ),
+}
+
+# A name ending in a contact's honorific ("Bey", "Hanım") is the contact's, not
+# the visitor's, and a title means the name needs the LLM to tidy it up
+_TITLES = frozenset(["mr", "mrs", "ms", "miss", "dr", "prof"])
+_HONORIFICS = frozenset(
+    contact.split()[-1].casefold() for contact in CONTACTS if len(contact.split()) > 1
+)
+
+
+@lru_cache(maxsize=None)
+def _extraction_prompt_parts(missing_fields: Tuple[str, ...]) -> Tuple[str, str, str]:
+    """
+    Build the static prompt pieces for a set of missing fields once.
 
-    # Get JSON schema template from prompt manager and customize for missing fields
+    Returns:
+        tuple: (fields list, field descriptions JSON, extraction schema JSON)
+    """
     extraction_schema = {
         "extracted_fields": {
             field: "string or null (if not found)" for field in missing_fields
         },
-        "confidence": {field: "number between 0 and 1" for field in missing_fields},
     }
-
-    # Create unified extraction prompt using prompt manager
     fields_descriptions = {
         field: prompt_manager.get_field_description(field) for field in missing_fields
     }
+    return (
+        ", ".join(missing_fields),
+        json.dumps(fields_descriptions, indent=2),
+        json.dumps(extraction_schema, indent=2),
+    )
+
+
+@lru_cache(maxsize=None)
+def _extraction_format(missing_fields: Tuple[str, ...]) -> dict:
+    """
+    Build the JSON schema Ollama uses to constrain decoding for a set of missing fields.
+    """
+    return {
+        "type": "object",
+        "properties": {
+            "extracted_fields": {
+                "type": "object",
+                "properties": {
+                    field: {"type": ["string", "null"]} for field in missing_fields
+                },
+                "required": list(missing_fields),
+            },
+        },
+        "required": ["extracted_fields"],
+    }
+
+
+@lru_cache(maxsize=None)
+def _prefix_pattern(field: str) -> "re.Pattern[str]":
+    """
+    Compile the configured extraction prefixes for a field into one anchored regex.
+    """
+    prefixes = "|".join(
+        re.escape(prefix) if prefix.endswith(":") else rf"{re.escape(prefix)}\b"
+        for prefix in prompt_manager.get_extraction_prefixes(field)
+    )
+    return re.compile(rf"^(?:{prefixes})\s*", re.IGNORECASE)
+
+
+def _clean_extracted_value(field: str, value) -> Optional[str]:
+    """
+    Strip "Name:"-style prefixes and quotes from an extracted value and limit it to 3 words.
+
+    Returns:
+        str: The cleaned value, or None when nothing usable was extracted
+    """
+    if not value or value == "-1" or str(value).lower() == "null":
+        return None
+    value = _prefix_pattern(field).sub("", str(value).strip(), count=1)
+    return " ".join(value.strip("\"'").split()[-3:]) or None
+
+
+def _first_pass_value(field: str, match: "re.Match[str]") -> Optional[str]:
+    """
+    Vet a first-pass regex match, returning None when the LLM should decide instead.
+    """
+    value = match.group(1)
+    if field == "contact_person":
+        # Matched case-insensitively, so map it back to the canonical contact name
+        return _CONTACTS_BY_NAME.get(value.casefold())
+
+    words = value.casefold().split()
+    if (
+        words[0] in _TITLES
+        or words[-1] in _HONORIFICS
+        or " ".join(words) in _CONTACTS_BY_NAME
+    ):
+        return None
+    return _clean_extracted_value(field, value)
+
+
+def _first_pass(message: str, missing_fields: Tuple[str, ...]) -> Dict[str, str]:
+    """
+    Extract the missing fields that a visitor message states unambiguously.
+
+    Args:
+        message: Newest visitor message
+        missing_fields: Profile fields that are still unknown
+
+    Returns:
+        Dict[str, str]: Field values found, keyed by field name
+    """
+    values = {}
+    for field in missing_fields:
+        pattern = _FIRST_PASS_PATTERNS.get(field)
+        match = pattern.search(message) if pattern else None
+        value = _first_pass_value(field, match) if match else None
+        if value:
+            values[field] = value
+    return values
+
+
+def check_visitor_profile_node(state: State) -> State:
+    """
+    Node function that performs LLM extraction and updates the visitor profile using structured JSON output.
+    """
+    profile = state["visitor_profile"]
+
+    # Check which fields are missing (excluding threat_level) before doing any work
+    missing_fields = tuple(
+        field for field in _FIELDS_TO_EXTRACT if profile[field] is None
+    )
+
+    if not missing_fields:
+        logger.debug("✅ All fields already extracted")
+        return state
+
+    last_message = state["messages"][-1]
+    if last_message.type == "human" and _GREETING_RE.match(last_message.content):
+        logger.debug("ℹ️ Greeting only, skipping profile extraction")
+        return state
+
+    # Cheap first pass over the newest visitor message; the LLM only gets the rest
+    if last_message.type == "human":
+        for field, value in _first_pass(last_message.content, missing_fields).items():
+            profile[field] = value
+            logger.debug("⚡ Matched %s without LLM: %s", field, value)
+        missing_fields = tuple(field for field in missing_fields if profile[field] is None)
+
+        if not missing_fields:
+            logger.debug("📋 Current visitor profile: %s", profile)
+            return state
+
+    # Get current conversation context, formatting only the new messages
+    conversation_text = "\n".join(sync_conversation_lines(state))
+
+    # Create unified extraction prompt from the cached per-field-set pieces
+    fields_list, fields_descriptions, json_schema = _extraction_prompt_parts(
+        missing_fields
+    )
 
     prompt_value = prompt_manager.invoke_prompt(
         "processing",
         "extract_multiple_fields_json",
-        fields_to_extract=", ".join(missing_fields),
-        fields_descriptions=json.dumps(fields_descriptions, indent=2),
+        fields_to_extract=fields_list,
+        fields_descriptions=fields_descriptions,
         conversation_text=conversation_text,
-        json_schema=json.dumps(extraction_schema, indent=2),
+        json_schema=json_schema,
     )
 
     try:
-        response = llm_profiler_json.invoke(prompt_value)
-        # Handle response content properly
-        if hasattr(response, "content"):
-            content = response.content
-        else:
-            content = str(response)
-
-        if isinstance(content, str):
-            extraction_data = json.loads(content)
-        else:
-            raise ValueError("Response content is not a string")
+        # Single call extracts every missing field at once, with decoding
+        # constrained to the extraction schema
+        response = llm_profiler_json.invoke(
+            prompt_value, format=_extraction_format(missing_fields)
+        )
+        extraction_data = parse_json_response(response)
 
         # Update profile with extracted fields
         extracted_fields = extraction_data.get("extracted_fields", {})
@@ -89,32 +251,21 @@ def check_visitor_profile_node(state: State) -> State:
 
 
                 # Validate and clean the extracted value
-                if value and value != "-1" and value.lower() != "null":
-                    # Additional cleaning
-                    value = str(value).strip("\"'")
-
-                    #limit to 3 words
-                    words = value.split()
-                    if len(words) > 3:
-                        value = " ".join(words[-3:])
-
-                    state["visitor_profile"][field] = value
+                value = _clean_extracted_value(field, value)
+                if value:
+                    profile[field] = value
                 else:
-                    print(f"❌ Could not extract {field}")
+                    logger.debug("❌ Could not extract %s", field)
 
     except (json.JSONDecodeError, KeyError, Exception) as error:
-        print(f"⚠️ JSON extraction failed: {error}")
+        logger.warning("⚠️ JSON extraction failed: %s", error)
         # Set fields as None if JSON extraction fails
         for field in missing_fields:
-            if state["visitor_profile"][field] is None:
-                print(f"❌ Could not extract {field}")
+            if profile[field] is None:
+                logger.debug("❌ Could not extract %s", field)
 
-    # Print current visitor profile status for debugging
-    print(f"\n📋 Current Visitor Profile:")
-    for field, value in state["visitor_profile"].items():
-        status = "✅" if value is not None and value != "-1" else "❌"
-        print(f"  {status} {field}: {value}")
-    print()
+    # Lazily formatted, so the profile dump costs nothing unless DEBUG is enabled
+    logger.debug("📋 Current visitor profile: %s", profile)
 
     return state
 
@@ -132,7 +283,7 @@ def analyze_threat_level_node(state: State) -> State:
         else:
             threat_level = "low"
         state["visitor_profile"]["threat_level"] = threat_level
-        print(f"🔍 Vision analysis result: {vision_data}")
+        logger.debug("🔍 Vision analysis result: %s", vision_data)
 
     return state
 
@@ -146,33 +297,39 @@ def validate_contact_person(state: State) -> State:
 
     # If no contact person was extracted, keep as None
     if not contact_person or contact_person == "-1":
-        print("❌ Contact validation: No contact person found in conversation")
+        logger.info("❌ Contact validation: No contact person found in conversation")
         state["visitor_profile"]["contact_person"] = None
         return state
 
     # Check if the extracted contact person matches our known contacts
     if contact_person in CONTACTS:
-        print(f"✅ Contact validation: '{contact_person}' is valid")
+        logger.debug("✅ Contact validation: '%s' is valid", contact_person)
         # Keep the validated contact person
         state["visitor_profile"]["contact_person"] = contact_person
     else:
-        # Try case-insensitive matching for better user experience
-        contact_lower = contact_person.lower()
-        matched_contact = None
+        # Try case-insensitive, first-name and then fuzzy (typo tolerant) matching
+        contact_key = " ".join(contact_person.casefold().split())
+        matched_contact = _CONTACTS_BY_NAME.get(contact_key)
 
-        for known_contact in CONTACTS.keys():
-            if known_contact.lower() == contact_lower:
-                matched_contact = known_contact
-                break
+        if matched_contact is None:
+            matched_contact = _CONTACTS_BY_FIRST_NAME.get(contact_key)
+
+        if matched_contact is None:
+            close_matches = get_close_matches(
+                contact_key, _CONTACTS_BY_NAME, n=1, cutoff=0.8
+            )
+            if close_matches:
+                matched_contact = _CONTACTS_BY_NAME[close_matches[0]]
 
         if matched_contact:
-            print(
-                f"✅ Contact validation: Matched '{matched_contact}' (case corrected)"
+            logger.debug(
+                "✅ Contact validation: Matched '%s' (normalized)", matched_contact
             )
             state["visitor_profile"]["contact_person"] = matched_contact
         else:
-            print(
-                f"⚠️ Contact person '{contact_person}' not in known list, keeping as None"
+            logger.warning(
+                "⚠️ Contact person '%s' not in known list, keeping as None",
+                contact_person,
             )
             state["visitor_profile"]["contact_person"] = None
 
@@ -185,25 +342,16 @@ def check_visitor_profile_condition(
     """
     Simple conditional function that only checks if profile is complete.
     """
-    # Check if all required fields are completed
+    # Stop at the first missing field and set id_verified based on completeness
     profile = state["visitor_profile"]
-    all_fields_complete = all(
-        [
-            profile["name"] is not None and profile["name"] != "-1",
-            profile["purpose"] is not None and profile["purpose"] != "-1",
-            profile["contact_person"] is not None and profile["contact_person"] != "-1",
-            profile["threat_level"] is not None and profile["threat_level"] != "-1",
-            profile["affiliation"] is not None and profile["affiliation"] != "-1",
-        ]
-    )
+    for field in _PROFILE_FIELDS:
+        value = profile[field]
+        if value is None or value == "-1":
+            profile["id_verified"] = False
+            return "not_complete"
 
-    # Set id_verified based on completeness
-    if all_fields_complete:
-        state["visitor_profile"]["id_verified"] = True
-        return "complete"
-    else:
-        state["visitor_profile"]["id_verified"] = False
-        return "not_complete"
+    profile["id_verified"] = True
+    return "complete"
 
 
 def question_visitor(state: State) -> State:
@@ -211,41 +359,17 @@ def question_visitor(state: State) -> State:
     Ask specific questions for missing visitor profile fields.
     """
 
-    # Get questions from prompt manager
-    known_contacts_list = ", ".join(CONTACTS.keys())
-
     # Find the first missing field that needs to be completed
-    fields_to_check = [
-        "name",
-        "purpose",
-        "contact_person",
-        "threat_level",
-        "affiliation",
-    ]
-
-    for field in fields_to_check:
-        if (
-            state["visitor_profile"][field] is None
-            or state["visitor_profile"][field] == "-1"
-        ):
-            # Get question for this field from prompt manager
-            if field == "contact_person":
-                question_text = prompt_manager.get_field_question(
-                    field, known_contacts=known_contacts_list
-                )
-            else:
-                question_text = prompt_manager.get_field_question(field)
-
-            question = AIMessage(content=question_text)
-            state["messages"].append(question)
-            state["agent_response"] = question_text
+    profile = state["visitor_profile"]
+    for field in _PROFILE_FIELDS:
+        value = profile[field]
+        if value is None or value == "-1":
+            question = _QUESTION_TEXTS[field]
+            state["messages"].append(AIMessage(content=question))
+            state["agent_response"] = question
             return state
 
     # Fallback if somehow all fields are filled but we're still here
-    fallback_question = prompt_manager.get_field_data("input_validation")[
-        "fallback_question"
-    ]
-    question = AIMessage(content=fallback_question)
-    state["messages"].append(question)
-    state["agent_response"] = fallback_question
+    state["messages"].append(AIMessage(content=_FALLBACK_QUESTION_TEXT))
+    state["agent_response"] = _FALLBACK_QUESTION_TEXT
     return state
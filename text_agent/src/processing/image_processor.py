@@ -1,6 +1,5 @@
 import time
 import os
-import base64
 import json
 from datetime import datetime
 from src.utils.llm_utilities import analyze_image_with_prompt
@@ -262,7 +261,7 @@ def image_processing_function(image_queue, socketio_events_queue=None, state_req
 
                     # Extract session_id and image data
                     session_id = latest_image_queue_element.get("session_id", "unknown")
-                    image_b64 = base64.b64encode(latest_image_queue_element["data"]).decode("utf-8")
+                    image_b64 = latest_image_queue_element["image_b64"]
 
                     threat_detector(session_id, image_b64, socketio_events_queue, state_request_queue)
             else:
@@ -1,12 +1,19 @@
 # Utils package
 
-from src.utils.extraction import extract_answer_from_thinking_model
+from src.utils.extraction import extract_answer_from_thinking_model, parse_json_response
+from src.utils.cache import LRUCache, LRULLMCache
+from src.utils.conversation import format_message, sync_conversation_lines
 from src.utils.prompt_manager import PromptManager, prompt_manager
 from src.utils.gmail_sender import email_sender
 from src.utils.llm_utilities import analyze_image_with_prompt
 
 __all__ = [
     "extract_answer_from_thinking_model",
+    "parse_json_response",
+    "LRUCache",
+    "LRULLMCache",
+    "format_message",
+    "sync_conversation_lines",
     "PromptManager",
     "prompt_manager",
     "email_sender",
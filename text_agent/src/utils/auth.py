@@ -1,12 +1,12 @@
-import json
+import orjson
 
 def authenticate(employee_name):
     """
     Authenticate employee by checking if the name exists in the employees database.
     """
     try:
-        with open("./data/db/employees.json", "r") as f:
-            employees = json.load(f)
+        with open("./data/db/employees.json", "rb") as f:
+            employees = orjson.loads(f.read())
 
         # Check if an employee with the given name exists (case-insensitive)
         return any(emp["name"].lower() == employee_name.lower() for emp in employees)
@@ -18,8 +18,8 @@ def _find_employee(employee_name):
     A helper function to find an employee's data by name.
     """
     try:
-        with open("./data/db/employees.json", "r") as f:
-            employees = json.load(f)
+        with open("./data/db/employees.json", "rb") as f:
+            employees = orjson.loads(f.read())
 
         # Find the employee and return their data (case-insensitive)
         for employee in employees:
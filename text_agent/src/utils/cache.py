@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+
+
+class LRUCache:
+    """
+    Small thread-safe least-recently-used cache.
+
+    Graph runs for different sessions execute in worker threads, so every
+    access is guarded by a lock. Hits and misses are counted for logging.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class LRULLMCache(BaseCache):
+    """
+    LangChain LLM response cache backed by LRUCache.
+
+    langchain_core's InMemoryCache is unlocked and only evicts when its size
+    equals maxsize exactly, so concurrent graph threads can push it past the
+    cap for good. This one stays bounded under concurrent updates.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """Return the cached generations for a prompt and model configuration."""
+        return self._cache.get((prompt, llm_string))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """Store the generations for a prompt and model configuration."""
+        self._cache.put((prompt, llm_string), return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        """Drop every cached response."""
+        self._cache.clear()
@@ -0,0 +1,33 @@
+from typing import List
+
+
+def format_message(message) -> str:
+    """
+    Format a single message as a "type: content" conversation line.
+    """
+    return f"{message.type}: {message.content}"
+
+
+def sync_conversation_lines(state) -> List[str]:
+    """
+    Bring the cached conversation lines up to date with the message history.
+
+    The lines are kept in state["conversation_lines"], one per message, so each
+    message is formatted only once. Nodes that replace the message history must
+    reset the cache to an empty list.
+
+    Args:
+        state: The graph state holding "messages" and "conversation_lines"
+
+    Returns:
+        List[str]: Formatted lines aligned with state["messages"]
+    """
+    messages = state["messages"]
+    lines = state.setdefault("conversation_lines", [])
+
+    # History was replaced without resetting the cache, rebuild from scratch
+    if len(lines) > len(messages):
+        lines.clear()
+
+    lines.extend(format_message(message) for message in messages[len(lines):])
+    return lines
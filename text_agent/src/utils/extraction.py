@@ -1,3 +1,14 @@
+import json
+import re
+import orjson
+
+# Captures the answer that follows the closing tag of a thinking section
+_THINK_RE = re.compile(r"</think>\s*(.*)", re.DOTALL)
+
+# Matches the outermost JSON object in a response that carries stray prose
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
 def extract_answer_from_thinking_model(response):
     """
     Extract the actual answer from thinking models that wrap responses in <think> tags.
@@ -13,12 +24,36 @@ def extract_answer_from_thinking_model(response):
     else:
         content = str(response)
 
-    # Check if the response contains a thinking section
+    # Check if the response contains a thinking section and take everything after it
     if "<think>" in content:
-        # Split by </think> and get everything after it
-        parts = content.split("</think>", 1)
-        if len(parts) > 1:
-            return parts[1].strip()
+        match = _THINK_RE.search(content)
+        if match:
+            return match.group(1).rstrip()
 
     # Return the original content if no think tags found
     return content.strip()
+
+
+def parse_json_response(response) -> dict:
+    """
+    Parse the JSON object from an LLM response, tolerating thinking tags and stray prose.
+
+    Args:
+        response: The LLM response object or string
+
+    Returns:
+        dict: The parsed JSON object
+
+    Raises:
+        json.JSONDecodeError: If no valid JSON object can be found in the response
+    """
+    content = extract_answer_from_thinking_model(response)
+
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    try:
+        return orjson.loads(content)
+    except json.JSONDecodeError:
+        match = _JSON_OBJECT_RE.search(content)
+        if match is None:
+            raise
+        return orjson.loads(match.group(0))
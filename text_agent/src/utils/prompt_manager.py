@@ -19,6 +19,7 @@ class PromptManager:
         self._data: Dict[str, Any] = {}
         self._field_data: Dict[str, Any] = {}
         self._schemas: Dict[str, Any] = {}
+        self._schema_texts: Dict[str, str] = {}
         self._load_prompts()
         self._load_field_data()
         self._load_schemas()
@@ -92,7 +93,9 @@ class PromptManager:
         if template is None:
             raise ValueError(f"Prompt not found: {category}/{name}")
 
-        return template.invoke(kwargs)
+        # format_prompt builds the same PromptValue as invoke() without the
+        # Runnable config/callback setup, which dominated the cost per call
+        return template.format_prompt(**kwargs)
 
     def get_data(self, category: str, key: Optional[str] = None) -> Any:
         """Get static data from templates (non-template entries)"""
@@ -134,6 +137,14 @@ class PromptManager:
         """Get a JSON schema by name"""
         return self._schemas.get(schema_name, {})
 
+    def get_schema_text(self, schema_name: str) -> str:
+        """Get a JSON schema serialized for prompts, rendered once per schema"""
+        if schema_name not in self._schema_texts:
+            self._schema_texts[schema_name] = json.dumps(
+                self.get_schema(schema_name), indent=2
+            )
+        return self._schema_texts[schema_name]
+
 
 # Global instance
 prompt_manager = PromptManager()
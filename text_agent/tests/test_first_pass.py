@@ -0,0 +1,32 @@
+from src.nodes.processing_nodes import _FIELDS_TO_EXTRACT, _first_pass
+
+
+def test_name_and_contact():
+    assert _first_pass(
+        "My name is Ahmet. I want to see nermin hanım", _FIELDS_TO_EXTRACT
+    ) == {"name": "Ahmet", "contact_person": "Nermin Hanım"}
+
+
+def test_only_missing_fields():
+    assert _first_pass("My name is Ahmet", ("purpose",)) == {}
+
+
+def test_negated_purpose_left_to_llm():
+    assert _first_pass(
+        "I am not here for a meeting, just dropping off a package", _FIELDS_TO_EXTRACT
+    ) == {}
+
+
+def test_adjectives_are_not_names():
+    for message in ("I am Armed", "This is Urgent", "Hi, I am Sick."):
+        assert _first_pass(message, _FIELDS_TO_EXTRACT) == {}, message
+
+
+def test_titles_left_to_llm():
+    for message in ("I am Mr Smith", "I am Dr", "My name is Dr Smith"):
+        assert _first_pass(message, _FIELDS_TO_EXTRACT) == {}, message
+
+
+def test_contact_is_not_affiliation_or_name():
+    assert _first_pass("I represent Osman Bey", _FIELDS_TO_EXTRACT) == {}
+    assert _first_pass("My name is Osman Bey", ("name",)) == {}